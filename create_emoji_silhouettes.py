@@ -3,9 +3,27 @@
 Download emoji images and convert to white silhouettes with transparency for Android.
 """
 
-import requests
+import argparse
+import asyncio
+import hashlib
+import httpx
+import io
+import json
+import random
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from PIL import Image
+import numpy as np
 import os
+from pathlib import Path
+
+from png_optimize import PNG_FAST, add_optimize_argument, optimize_pngs, png_save_options
+
+try:
+    import h2  # optional: pip install 'httpx[http2]'
+except ImportError:
+    h2 = None
 
 DENSITIES = [
     ('mdpi', 24),
@@ -15,68 +33,214 @@ DENSITIES = [
     ('xxxhdpi', 96),
 ]
 
+LARGEST_SIZE = max(size for _, size in DENSITIES)
+
 BASE_DIR = 'app/src/main/res'
 
-def download_and_convert(emoji_char, output_name):
-    """Download emoji and convert to white silhouette with transparency."""
-    url = f"https://emojicdn.elk.sh/{emoji_char}?style=apple"
+# (size, dir_path) for every density, in DENSITIES order, resolved once
+_DENSITY_TARGETS = [(size, os.path.join(BASE_DIR, f'drawable-{density}'))
+                    for density, size in DENSITIES]
+
+# All emojis come from the same CDN host: over HTTP/2 (if h2 is installed)
+# every download is a stream multiplexed on one TLS connection. Otherwise
+# the client uses HTTP/1.1 and these limits keep idle connections alive
+HTTP_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+HTTP_TIMEOUT = 10
+MAX_CONNECTIONS = 8
+MAX_KEEPALIVE_CONNECTIONS = 4
+KEEPALIVE_EXPIRY = 30
+
+# At most this many requests in flight, so large emoji lists don't trip the
+# CDN's rate limiting; 429/503 responses are retried with backoff
+MAX_IN_FLIGHT = 8
+MAX_RETRIES = 3
+RETRY_STATUSES = {429, 503}
+
+EMOJI_STYLE = 'apple'
+
+# Downloaded emojis are cached here so re-runs don't hit the network
+CACHE_DIR = Path.home() / '.cache' / 'airtime-emoji'
+
+def cache_paths(emoji_char):
+    """Return (image_path, validators_path) for an emoji in the cache."""
+    key = hashlib.sha1(f"{emoji_char}|{EMOJI_STYLE}".encode()).hexdigest()
+    return CACHE_DIR / f'{key}.png', CACHE_DIR / f'{key}.json'
+
+def _write_atomic(path, data):
+    """Write bytes to path via a temp file so readers never see a partial file."""
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as f:
+        f.write(data)
+    os.replace(f.name, path)
+
+def store_in_cache(cache_path, validators_path, data, validators):
+    """Store downloaded emoji bytes and their HTTP validators (ETag / Last-Modified)."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _write_atomic(cache_path, data)
+    _write_atomic(validators_path, json.dumps(validators).encode())
+
+def _save_png(img, output_path, png_options):
+    """Save one resized density (runs in a worker thread)."""
+    # Save as RGBA PNG (with transparency)
+    img.save(output_path, 'PNG', **png_options)
+    return output_path
+
+def convert_and_save(src, output_name, executor, png_options=PNG_FAST):
+    """Convert a downloaded emoji (path or binary file object) to white silhouette with transparency."""
+    # Open image, letting the decoder reduce toward the largest target
+    # where the format supports it (no-op for PNG)
+    img = Image.open(src)
+    img.draft('RGBA', (LARGEST_SIZE, LARGEST_SIZE))
+    img.load()
+
+    # Convert to RGBA if not already (convert() always copies)
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+
+    # Build the white silhouette in one buffer: constant white color,
+    # source alpha as the transparency mask
+    arr = np.array(img)
+    result_data = np.empty_like(arr)
+    result_data[..., :3] = 255
+    result_data[..., 3] = arr[..., 3]
+    result = Image.fromarray(result_data, 'RGBA')
+
+    # Generate all sizes largest first: each level is resized from the
+    # previous one, so only the first step works on the full-size source
+    sizes = []
+    levels = []
+    output_paths = []
+    current = result
+    for size, dir_path in sorted(_DENSITY_TARGETS, reverse=True):
+        # Resize using high-quality resampling
+        current = current.resize((size, size), Image.Resampling.LANCZOS)
+        sizes.append(size)
+        levels.append(current)
+        output_paths.append(os.path.join(dir_path, f'{output_name}.png'))
+
+    # Encode densities concurrently; PIL releases the GIL while deflating
+    saved = executor.map(_save_png, levels, output_paths, repeat(png_options))
+    for size, output_path in zip(sizes, saved):
+        print(f'  Created {output_path} ({size}x{size}) - WHITE SILHOUETTE (with transparency)')
+
+    return True
+
+async def get_with_retry(client, sem, url, headers):
+    """
+    GET url under the semaphore, retrying rate-limited responses with backoff.
+
+    Returns (response, body). On HTTP 200 the body is streamed chunk by chunk
+    into a BytesIO (rewound, ready for Image.open); otherwise body is None.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        body = None
+        async with sem:
+            async with client.stream('GET', url, headers=headers) as response:
+                if response.status_code == 200:
+                    body = io.BytesIO()
+                    async for chunk in response.aiter_bytes():
+                        body.write(chunk)
+                    body.seek(0)
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            return response, body
+
+        # Honor Retry-After (seconds) if given, otherwise back off exponentially;
+        # jitter keeps concurrent retries from arriving together
+        retry_after = response.headers.get('Retry-After', '')
+        delay = int(retry_after) if retry_after.isdigit() else 2 ** attempt
+        delay += random.uniform(0, delay)
+        print(f"  HTTP {response.status_code} for {url}, retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+async def fetch(client, sem, executor, emoji_char, output_name, refresh=False,
+                png_options=PNG_FAST):
+    """Download (or reuse cached) emoji and convert to white silhouette with transparency."""
+    url = f"https://emojicdn.elk.sh/{emoji_char}?style={EMOJI_STYLE}"
+    cache_path, validators_path = cache_paths(emoji_char)
 
-    print(f"Downloading {output_name} ({emoji_char})...")
     try:
-        response = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-        if response.status_code != 200:
-            print(f"  Failed to download: HTTP {response.status_code}")
-            return False
-
-        # Save to temp file
-        temp_path = f"/tmp/emoji_{output_name}.png"
-        with open(temp_path, 'wb') as f:
-            f.write(response.content)
-
-        # Open image
-        img = Image.open(temp_path)
-
-        # Convert to RGBA if not already
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
-
-        # Extract alpha channel (transparency mask)
-        alpha = img.split()[3]
-
-        # Create result image: white where alpha > 0, transparent elsewhere
-        result = Image.new('RGBA', img.size, (255, 255, 255, 0))  # Start with transparent white
-
-        # Apply alpha channel to create white silhouette
-        white_layer = Image.new('RGBA', img.size, (255, 255, 255, 255))  # Solid white
-        result = Image.composite(white_layer, result, alpha)
-
-        # Generate all sizes
-        for density, size in DENSITIES:
-            dir_path = os.path.join(BASE_DIR, f'drawable-{density}')
-            os.makedirs(dir_path, exist_ok=True)
-
-            # Resize using high-quality resampling
-            resized = result.resize((size, size), Image.Resampling.LANCZOS)
-            output_path = os.path.join(dir_path, f'{output_name}.png')
-
-            # Save as RGBA PNG (with transparency)
-            resized.save(output_path, 'PNG')
-            print(f'  Created {output_path} ({size}x{size}) - WHITE SILHOUETTE (with transparency)')
-
-        os.remove(temp_path)
-        return True
+        src = cache_path
+        if cache_path.exists() and not refresh:
+            print(f"Using cached {output_name} ({emoji_char})...")
+        else:
+            # Revalidate an existing cache entry instead of re-downloading it
+            headers = {}
+            if cache_path.exists() and validators_path.exists():
+                headers = json.loads(validators_path.read_text())
+
+            print(f"Downloading {output_name} ({emoji_char})...")
+            response, body = await get_with_retry(client, sem, url, headers)
+            if response.status_code == 304:
+                print(f"  {output_name} not modified, using cache")
+            elif response.status_code != 200:
+                print(f"  Failed to download {output_name}: HTTP {response.status_code}")
+                return False
+            else:
+                # Only cache bodies that decode as images, so an error page
+                # served with 200 isn't reused on every later run
+                Image.open(body).verify()
+                body.seek(0)
+
+                validators = {}
+                if 'ETag' in response.headers:
+                    validators['If-None-Match'] = response.headers['ETag']
+                if 'Last-Modified' in response.headers:
+                    validators['If-Modified-Since'] = response.headers['Last-Modified']
+                await asyncio.to_thread(store_in_cache, cache_path, validators_path,
+                                        body.getbuffer(), validators)
+                src = body
+
+        # PIL work runs off the event loop so other downloads keep progressing
+        return await asyncio.to_thread(convert_and_save, src, output_name, executor,
+                                       png_options)
 
     except Exception as e:
-        print(f"  Error: {e}")
+        print(f"  Error ({output_name}): {e}")
         import traceback
         traceback.print_exc()
         return False
 
+async def run_all(icons, refresh=False, png_options=PNG_FAST):
+    """
+    Download and convert all emojis concurrently.
+
+    Returns {output_name: succeeded} for every emoji in icons.
+    """
+    for _, dir_path in _DENSITY_TARGETS:
+        os.makedirs(dir_path, exist_ok=True)
+
+    limits = httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    sem = asyncio.Semaphore(MAX_IN_FLIGHT)
+    with ThreadPoolExecutor(max_workers=len(DENSITIES)) as executor:
+        async with httpx.AsyncClient(http2=h2 is not None, limits=limits, timeout=HTTP_TIMEOUT,
+                                     headers=HTTP_HEADERS) as client:
+            async with asyncio.TaskGroup() as tg:
+                tasks = {name: tg.create_task(fetch(client, sem, executor, emoji, name,
+                                                    refresh, png_options))
+                         for emoji, name in icons}
+
+    return {name: task.result() for name, task in tasks.items()}
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--refresh', action='store_true',
+                        help='revalidate cached emojis with the CDN (ETag / If-Modified-Since)')
+    add_optimize_argument(parser)
+    args = parser.parse_args()
+
     icons = [
         ('🚬', 'ic_notification_cigarette'),
         ('🌿', 'ic_notification_leaf'),
     ]
 
-    for emoji, name in icons:
-        download_and_convert(emoji, name)
+    results = asyncio.run(run_all(icons, args.refresh, png_save_options(args.optimize)))
+
+    if args.optimize:
+        # Only emojis converted in this run; a failed one may still have
+        # stale files from an earlier run that shouldn't be touched
+        optimize_pngs([os.path.join(dir_path, f'{name}.png')
+                       for name, succeeded in results.items() if succeeded
+                       for _, dir_path in _DENSITY_TARGETS])
@@ -4,9 +4,15 @@ Generate PNG notification icons for Android.
 Creates cigarette and leaf icons at all required densities.
 """
 
-from PIL import Image, ImageDraw
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+from PIL import Image
+import numpy as np
 import os
 
+from png_optimize import add_optimize_argument, optimize_pngs, png_save_options
+
 # Density specifications: (directory_suffix, size_in_pixels)
 DENSITIES = [
     ('mdpi', 24),
@@ -19,10 +25,30 @@ DENSITIES = [
 BASE_DIR = 'app/src/main/res'
 
 
+# (size, dir_path) for every density, in DENSITIES order, resolved once
+_DENSITY_TARGETS = [(size, os.path.join(BASE_DIR, f'drawable-{density}'))
+                    for density, size in DENSITIES]
+
+# Shapes are rasterized once at 2x the largest density and downsampled,
+# which anti-aliases the primitives and keeps every density consistent
+MASTER_SIZE = 2 * max(size for _, size in DENSITIES)
+
+
+def _mask_to_icon(mask):
+    """Turn a boolean (size, size) mask into a white-on-transparent RGBA icon."""
+    data = np.zeros(mask.shape + (4,), dtype=np.uint8)
+    data[mask] = 255
+    return Image.fromarray(data, 'RGBA')
+
+
+def _rect_mask(xx, yy, x0, y0, x1, y1):
+    """Boolean mask of a filled rectangle, bounds inclusive (like ImageDraw.rectangle)."""
+    return (xx >= x0) & (xx <= x1) & (yy >= y0) & (yy <= y1)
+
+
 def create_cigarette_icon(size):
     """Create a cigarette icon (horizontal rectangle with filter at end)."""
-    img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
+    yy, xx = np.ogrid[:size, :size]
     
     # Calculate dimensions scaled to size
     # Cigarette body: ~60% of width, centered vertically
@@ -36,74 +62,91 @@ def create_cigarette_icon(size):
     filter_x = body_x + body_width
     filter_y = body_y
     
-    # Draw body (filled rectangle)
-    draw.rectangle(
-        [body_x, body_y, body_x + body_width, body_y + body_height],
-        fill=(255, 255, 255, 255)
-    )
+    # Body and filter (filled rectangles)
+    body_mask = _rect_mask(xx, yy, body_x, body_y, body_x + body_width, body_y + body_height)
+    filter_mask = _rect_mask(xx, yy, filter_x, filter_y,
+                             filter_x + filter_width, filter_y + body_height)
     
-    # Draw filter (filled rectangle, slightly different shade or outline)
-    draw.rectangle(
-        [filter_x, filter_y, filter_x + filter_width, filter_y + body_height],
-        fill=(255, 255, 255, 255)
-    )
-    
-    return img
+    return _mask_to_icon(body_mask | filter_mask)
 
 
 def create_leaf_icon(size):
     """Create a leaf icon (teardrop shape with center vein)."""
-    img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
+    yy, xx = np.ogrid[:size, :size]
     
     # Leaf shape: teardrop/oval pointing up with rounded bottom
     center_x = size // 2
+    tip_y = int(size * 0.1)
     top_y = int(size * 0.2)
     bottom_y = int(size * 0.8)
     width_at_mid = int(size * 0.5)
     left_x = center_x - width_at_mid // 2
     right_x = center_x + width_at_mid // 2
     
-    # Create a smoother leaf shape using an ellipse for the main body
-    # Draw the main leaf body (ellipse, wider at bottom)
-    bbox = (left_x, top_y, right_x, bottom_y)
-    draw.ellipse(bbox, fill=(255, 255, 255, 255))
+    # Main leaf body: ellipse inscribed in (left_x, top_y, right_x, bottom_y)
+    cx = (left_x + right_x) / 2
+    cy = (top_y + bottom_y) / 2
+    # (bounds inclusive, so the radii reach the outer edge of the bbox pixels)
+    rx = (right_x - left_x + 1) / 2
+    ry = (bottom_y - top_y + 1) / 2
+    ellipse_mask = ((xx - cx) / rx) ** 2 + ((yy - cy) / ry) ** 2 <= 1
     
-    # Draw the pointed top (triangle overlay)
-    top_points = [
-        (center_x, int(size * 0.1)),  # Top point
-        (left_x, top_y),               # Left edge
-        (right_x, top_y),              # Right edge
-    ]
-    draw.polygon(top_points, fill=(255, 255, 255, 255))
+    # Pointed top: triangle from the tip down to (left_x, top_y)-(right_x, top_y),
+    # its half-width growing linearly with the distance below the tip
+    half_width = (right_x - left_x) / 2
+    tri_mask = ((yy >= tip_y) & (yy <= top_y) &
+                (np.abs(xx - center_x) * (top_y - tip_y) <= half_width * (yy - tip_y)))
     
-    # Draw center vein (vertical line)
+    # Center vein (vertical line)
     stroke_width = max(1, size // 24)
-    draw.line(
-        [(center_x, top_y + int(size * 0.05)), (center_x, bottom_y - int(size * 0.05))],
-        fill=(255, 255, 255, 255),
-        width=stroke_width
-    )
+    line_mask = ((np.abs(xx - center_x) <= stroke_width // 2) &
+                 (yy >= top_y + int(size * 0.05)) & (yy <= bottom_y - int(size * 0.05)))
     
-    return img
+    return _mask_to_icon(ellipse_mask | tri_mask | line_mask)
+
+
+def _save_png(img, output_path, png_options):
+    """Save one density of an icon (runs in a worker thread)."""
+    img.save(output_path, 'PNG', **png_options)
+    return output_path
 
 
 def main():
     """Generate all icons at all densities."""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    add_optimize_argument(parser)
+    args = parser.parse_args()
+    png_options = png_save_options(args.optimize)
+    
+    for _, dir_path in _DENSITY_TARGETS:
+        os.makedirs(dir_path, exist_ok=True)
+    
     icons = [
         ('ic_notification_cigarette', create_cigarette_icon),
         ('ic_notification_leaf', create_leaf_icon),
     ]
     
+    sizes = []
+    levels = []
+    output_paths = []
     for icon_name, icon_func in icons:
-        for density, size in DENSITIES:
-            dir_path = os.path.join(BASE_DIR, f'drawable-{density}')
-            os.makedirs(dir_path, exist_ok=True)
-            
-            icon_img = icon_func(size)
-            output_path = os.path.join(dir_path, f'{icon_name}.png')
-            icon_img.save(output_path, 'PNG')
+        # Downsample largest first: each density is resized from the previous
+        # one, so only the first step works on the full-size master
+        current = icon_func(MASTER_SIZE)
+        for size, dir_path in sorted(_DENSITY_TARGETS, reverse=True):
+            current = current.resize((size, size), Image.Resampling.LANCZOS)
+            sizes.append(size)
+            levels.append(current)
+            output_paths.append(os.path.join(dir_path, f'{icon_name}.png'))
+    
+    # PIL releases the GIL while deflating, so the encodes overlap on threads
+    with ThreadPoolExecutor(max_workers=len(DENSITIES)) as executor:
+        saved = executor.map(_save_png, levels, output_paths, repeat(png_options))
+        for size, output_path in zip(sizes, saved):
             print(f'Created {output_path} ({size}x{size})')
+    
+    if args.optimize:
+        optimize_pngs(output_paths)
 
 
 if __name__ == '__main__':
@@ -4,10 +4,15 @@ Increase smoke opacity/density in cigarette PNG icons.
 Makes smoke less transparent while preserving the cigarette body.
 """
 
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from PIL import Image
 import numpy as np
 import os
 
+from png_optimize import PNG_FAST, add_optimize_argument, optimize_pngs, png_save_options
+
 # Density specifications: (directory_suffix, size_in_pixels)
 DENSITIES = [
     ('mdpi', 24),
@@ -19,7 +24,28 @@ DENSITIES = [
 
 BASE_DIR = 'app/src/main/res'
 
-def increase_smoke_opacity(input_path, output_path, opacity_multiplier=1.5):
+# (density, dir_path) for every density, resolved once
+_NAMED_DENSITY_DIRS = [(density, os.path.join(BASE_DIR, f'drawable-{density}'))
+                       for density, _ in DENSITIES]
+
+# Smoke typically has alpha < 240, cigarette body has alpha >= 240
+SMOKE_ALPHA_LIMIT = 240
+
+@lru_cache(maxsize=None)
+def smoke_opacity_lut(opacity_multiplier):
+    """
+    Build a 256-entry alpha lookup table for the given multiplier.
+
+    The new alpha is a pure function of the old one, so the whole image can be
+    remapped with a single uint8 index instead of float math per pixel.
+    """
+    lut = np.minimum(255, np.arange(256) * opacity_multiplier).astype(np.uint8)
+
+    # Preserve cigarette body pixels
+    lut[SMOKE_ALPHA_LIMIT:] = np.arange(SMOKE_ALPHA_LIMIT, 256, dtype=np.uint8)
+    return lut
+
+def increase_smoke_opacity(input_path, output_path, opacity_multiplier=1.5, png_options=PNG_FAST):
     """
     Increase opacity of smoke pixels in cigarette icon.
 
@@ -27,32 +53,30 @@ def increase_smoke_opacity(input_path, output_path, opacity_multiplier=1.5):
         input_path: Path to input PNG
         output_path: Path to output PNG
         opacity_multiplier: Factor to increase smoke opacity (1.0 = no change, >1.0 = more opaque)
+        png_options: Keyword arguments for the PNG encoder (see png_save_options)
     """
-    # Load image
-    img = Image.open(input_path).convert('RGBA')
+    # Load image (convert() always copies, so skip it when already RGBA)
+    img = Image.open(input_path)
+    img.load()
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
     pixels = np.array(img)
 
-    # Get alpha channel
-    alpha = pixels[:, :, 3].astype(float)
-
-    # Identify smoke pixels (lower opacity) vs cigarette body (high opacity)
-    # Smoke typically has alpha < 240, cigarette body has alpha >= 240
-    smoke_mask = alpha < 240
-
-    # Increase opacity of smoke pixels
-    alpha[smoke_mask] = np.minimum(255, alpha[smoke_mask] * opacity_multiplier)
-
-    # Convert back to uint8
-    pixels[:, :, 3] = alpha.astype(np.uint8)
+    # Increase opacity of smoke pixels (lower opacity), keep cigarette body
+    pixels[:, :, 3] = smoke_opacity_lut(opacity_multiplier)[pixels[:, :, 3]]
 
     # Create new image and save
     result = Image.fromarray(pixels, 'RGBA')
-    result.save(output_path, 'PNG')
+    result.save(output_path, 'PNG', **png_options)
 
     print(f'Processed {input_path} → {output_path}')
 
 def main():
     """Process cigarette icons at all densities."""
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    add_optimize_argument(parser)
+    args = parser.parse_args()
+    png_options = png_save_options(args.optimize)
 
     # Ask user for opacity multiplier
     try:
@@ -67,23 +91,35 @@ def main():
 
     print(f"Using opacity multiplier: {multiplier}")
 
-    for density, size in DENSITIES:
-        dir_path = os.path.join(BASE_DIR, f'drawable-{density}')
-        icon_path = os.path.join(dir_path, 'ic_notification_cigarette.png')
-
-        if os.path.exists(icon_path):
-            # Create backup in backups directory
-            os.makedirs('backups', exist_ok=True)
-            backup_path = f'backups/ic_notification_cigarette_{density}.png.backup'
-            if not os.path.exists(backup_path):
-                import shutil
-                shutil.copy2(icon_path, backup_path)
-                print(f'Created backup: {backup_path}')
-
-            # Process the icon
-            increase_smoke_opacity(icon_path, icon_path, multiplier)
-        else:
-            print(f'Warning: {icon_path} not found')
+    # Densities are independent; PIL releases the GIL while deflating,
+    # so the PNG encodes overlap across threads
+    with ThreadPoolExecutor(max_workers=len(DENSITIES)) as executor:
+        futures = []
+        icon_paths = []
+        for density, dir_path in _NAMED_DENSITY_DIRS:
+            icon_path = os.path.join(dir_path, 'ic_notification_cigarette.png')
+
+            if os.path.exists(icon_path):
+                # Create backup in backups directory
+                os.makedirs('backups', exist_ok=True)
+                backup_path = f'backups/ic_notification_cigarette_{density}.png.backup'
+                if not os.path.exists(backup_path):
+                    import shutil
+                    shutil.copy2(icon_path, backup_path)
+                    print(f'Created backup: {backup_path}')
+
+                # Process the icon
+                icon_paths.append(icon_path)
+                futures.append(executor.submit(increase_smoke_opacity, icon_path, icon_path,
+                                               multiplier, png_options))
+            else:
+                print(f'Warning: {icon_path} not found')
+
+        for future in futures:
+            future.result()
+
+    if args.optimize:
+        optimize_pngs(icon_paths)
 
     print("\nDone! Original files backed up with .backup extension.")
     print("Test the app to see the denser smoke effect.")
@@ -0,0 +1,48 @@
+"""
+Shared PNG output settings for the icon scripts.
+
+PIL encodes with fast zlib settings for iterative runs. --optimize is for
+assets that get shipped: with oxipng installed, PIL keeps the fast settings
+and the final files are recompressed by oxipng instead; without it, PIL
+falls back to its own maximum compression.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import oxipng  # optional: pip install pyoxipng
+except ImportError:
+    oxipng = None
+
+PNG_FAST = {'compress_level': 1}
+PNG_RELEASE = {'compress_level': 9, 'optimize': True}
+OXIPNG_LEVEL = 4
+
+
+def add_optimize_argument(parser):
+    """Add the shared --optimize flag to a script's argument parser."""
+    parser.add_argument('--optimize', action='store_true',
+                        help='smallest PNGs for release builds (oxipng if installed, slower)')
+
+
+def png_save_options(optimize):
+    """PIL save options for this run (see PNG_FAST / PNG_RELEASE)."""
+    if optimize and oxipng is None:
+        return PNG_RELEASE
+    return PNG_FAST
+
+
+def _oxipng_optimize(path):
+    """Losslessly recompress one PNG with oxipng (runs in a worker process)."""
+    oxipng.optimize(path, level=OXIPNG_LEVEL)
+    return path
+
+
+def optimize_pngs(paths):
+    """Recompress the final PNGs with oxipng across cores, if it is installed."""
+    if oxipng is None:
+        print('oxipng not installed (pip install pyoxipng), keeping PIL compression')
+        return
+    with ProcessPoolExecutor() as executor:
+        for path in executor.map(_oxipng_optimize, paths):
+            print(f'  Optimized {path}')
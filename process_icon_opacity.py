@@ -5,28 +5,47 @@ Process PNG icons to apply opacity threshold:
 - Pixels with < 15% opacity → 0% opacity (fully transparent)
 """
 
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from PIL import Image
 import os
 import numpy as np
 
+from png_optimize import PNG_FAST, add_optimize_argument, optimize_pngs, png_save_options
+
 # Opacity threshold: 15% = 0.15 * 255 = 38.25, so threshold is 39
 OPACITY_THRESHOLD = int(0.15 * 255)  # 38, so >= 39 means >= 15%
 
+# Output alpha for every possible input alpha: the threshold is a fixed
+# uint8 -> uint8 mapping, so each image is remapped with one table lookup
+_ALPHA_LUT = (np.arange(256) >= OPACITY_THRESHOLD + 1).astype(np.uint8) * np.uint8(255)
+
 BASE_DIR = 'app/src/main/res'
 
 # Density directories
 DENSITIES = ['mdpi', 'hdpi', 'xhdpi', 'xxhdpi', 'xxxhdpi']
 
+# Density directory paths, resolved once
+_DENSITY_DIRS = [os.path.join(BASE_DIR, f'drawable-{density}') for density in DENSITIES]
+
 # Icon names
 ICON_NAMES = ['ic_notification_cigarette', 'ic_notification_leaf']
 
 
-def process_image(img_path):
-    """Process a single PNG image with opacity threshold."""
-    # Open image
+def process_image(img_path, force=False):
+    """
+    Process a single PNG image with opacity threshold.
+    
+    Returns None if the alpha channel is already binary (only 0 and 255),
+    so re-running on processed icons doesn't rewrite them. Pass force=True
+    to always return the image (e.g. to re-encode it with other settings).
+    """
+    # Open image and decode it up front so img.mode reflects the pixel data
     img = Image.open(img_path)
+    img.load()
     
-    # Ensure RGBA mode
+    # Ensure RGBA mode (convert() always copies, so skip it when already RGBA)
     if img.mode != 'RGBA':
         img = img.convert('RGBA')
     
@@ -36,13 +55,14 @@ def process_image(img_path):
     # Extract alpha channel
     alpha = data[:, :, 3]
     
+    # Already thresholded (e.g. output of a previous run): nothing to do
+    if not force and set(np.unique(alpha).tolist()) <= {0, 255}:
+        return None
+    
     # Apply threshold: >= 15% opacity → 100%, < 15% → 0%
     # 15% of 255 = 38.25, so threshold value is 38
     # Pixels >= 39 (>= 38.25) → 255, pixels < 39 → 0
-    alpha_processed = np.where(alpha >= OPACITY_THRESHOLD + 1, 255, 0)
-    
-    # Update alpha channel in the image data
-    data[:, :, 3] = alpha_processed
+    data[:, :, 3] = _ALPHA_LUT[alpha]
     
     # Convert back to PIL Image
     processed_img = Image.fromarray(data, 'RGBA')
@@ -50,30 +70,56 @@ def process_image(img_path):
     return processed_img
 
 
+def _process_one(img_path, png_options):
+    """
+    Threshold one icon file and save it back in place (runs in a worker process).
+    
+    Returns (img_path, processed), where processed is False if the file was
+    already binary and left untouched. Binary files are still re-encoded when
+    png_options asks for more than the fast default (--optimize without oxipng).
+    """
+    processed_img = process_image(img_path, force=png_options != PNG_FAST)
+    if processed_img is None:
+        return img_path, False
+    processed_img.save(img_path, 'PNG', **png_options)
+    return img_path, True
+
+
 def main():
     """Process all icon PNG files."""
-    processed_count = 0
+    parser = argparse.ArgumentParser(description=__doc__.strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_optimize_argument(parser)
+    args = parser.parse_args()
+    png_options = png_save_options(args.optimize)
     
-    for density in DENSITIES:
+    img_paths = []
+    for dir_path in _DENSITY_DIRS:
         for icon_name in ICON_NAMES:
-            img_path = os.path.join(BASE_DIR, f'drawable-{density}', f'{icon_name}.png')
+            img_path = os.path.join(dir_path, f'{icon_name}.png')
             
             if not os.path.exists(img_path):
                 print(f'Warning: {img_path} not found, skipping')
                 continue
             
-            print(f'Processing {img_path}...')
-            
-            # Process the image
-            processed_img = process_image(img_path)
-            
-            # Save back to the same location
-            processed_img.save(img_path, 'PNG')
-            
-            processed_count += 1
-            print(f'  ✓ Processed {img_path}')
+            img_paths.append(img_path)
+    
+    # Every file is independent, so decode/threshold/encode them across cores
+    processed_count = 0
+    skipped_count = 0
+    with ProcessPoolExecutor() as executor:
+        for img_path, processed in executor.map(_process_one, img_paths, repeat(png_options)):
+            if processed:
+                processed_count += 1
+                print(f'  ✓ Processed {img_path}')
+            else:
+                skipped_count += 1
+                print(f'  - Skipped {img_path} (already binary)')
+    
+    if args.optimize:
+        optimize_pngs(img_paths)
     
-    print(f'\nDone! Processed {processed_count} icon files.')
+    print(f'\nDone! Processed {processed_count} icon files, skipped {skipped_count}.')
 
 
 if __name__ == '__main__':